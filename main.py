@@ -1,91 +1,232 @@
 from colorama import Back
-import heapq
+from numba import njit
+import numpy as np
+import math
 import time
-        
 
-class Coords:
-    """Operations with coordinates (indexes - i,j)"""
+
+# Value of a wall cell, as a byte.
+WALL = ord('X')
+
+# Number of coins that a cell holds, indexed by its value as a byte. Only digits hold coins.
+COIN_VALUES = np.zeros(256, 'i4')
+COIN_VALUES[ord('0'):ord('9')+1] = np.arange(10)
+
+# Length of a diagonal step between two cells.
+SQRT2 = math.sqrt(2)
+
+# (di, dj) offsets of 8 neighbors that forms an 3x3 area with a cell.
+NEIGHBOR_OFFSETS = (
+    (1, 0), (1, 1),
+    (-1, 0), (-1, -1),
+    (0, 1), (1, -1),
+    (0, -1), (-1, 1),
+)
+
+# (di, dj, step) of each neighbor offset, where 'step' is the distance to the neighbor.
+# Straight neighbors are 1, diagonal ones are sqrt(2) away from a cell.
+NEIGHBOR_STEPS = tuple((di, dj, 1.0 if di == 0 or dj == 0 else SQRT2) for di, dj in NEIGHBOR_OFFSETS)
+
+
+@njit(cache=True)
+def _heap_less(heap, a, b):
+    """Return True if heap entry 'a' comes before entry 'b', comparing (f, counter) pairs."""
+    return heap[a, 0] < heap[b, 0] or (heap[a, 0] == heap[b, 0] and heap[a, 1] < heap[b, 1])
+
+
+@njit(cache=True)
+def _heap_swap(heap, a, b):
+    """Swap heap entries 'a' and 'b'."""
+    for k in range(3):
+        heap[a, k], heap[b, k] = heap[b, k], heap[a, k]
+
+
+@njit(cache=True)
+def _heappush(heap, n, f, counter, idx):
+    """
+    Push an entry to a binary min-heap stored in the first 'n' rows of 'heap'.
+    If 'heap' is full, it is copied to a new array with double the capacity.
     
-    def distance(i1, j1, i2, j2):
-        """
-        Return the distance between two points, (i1,j1) and (i2,j2)
+    Args:
+        heap: (capacity, 3) array of (f, counter, idx) rows.
+        n: Number of entries in the heap.
+        f, counter: Sort key of the entry, 'counter' breaks ties between equal f values.
+        idx: Flat index of the cell, 'i*w + j'.
         
-        Args:
-            i1, j1: Coordinates of point 1.
-            i2, j2: Coordinates of point 2.
-            
-        Returns:
-            Distance between points.
-        """
-        return pow(pow(i1 - i2, 2) + pow(j1 - j2, 2), 1/2)
+    Returns:
+        The heap array, which might be a new one, and new number of entries in the heap.
+    """
+    if n == heap.shape[0]:
+        grown = np.empty((2*n, 3), heap.dtype)
+        grown[:n] = heap
+        heap = grown
+    heap[n, 0], heap[n, 1], heap[n, 2] = f, counter, idx
+    pos = n
+    while pos > 0:
+        parent = (pos - 1) // 2
+        if not _heap_less(heap, pos, parent):
+            break
+        _heap_swap(heap, pos, parent)
+        pos = parent
+    return heap, n + 1
 
-    def is_valid(i, j, w, h):
-        """
-        Return True if '0 <= i < h' and '0 <= j < w' for a coordinate of (i,j)
-        
-        Args:
-            i, j: Coordinates of point.
-            w, h: Width and height of a grid.
-            
-        Returns:
-            Bool.
-        """
-        return 0 <= i < h and 0 <= j < w
 
-    def neighbors(i, j, w, h):
-        """
-        Return valid neighbors of (i,j), 8 other coordinates that forms an 3x3 are with it.
-        'valid' means, for each neighbor it must be '0 <= n_i < h' and '0 <= n_j < w', when (n_i,n_j)
-        is neighbor coordinate.
-        
-        Args:
-            i, j: Coordinates of point.
-            w, h: Width and height of a grid.
-            
-        Returns:
-            A list of valid neighbors.
-        """
-        possible_neighbors = (
-            (i+1, j), (i+1, j+1),
-            (i-1, j), (i-1, j-1),
-            (i, j+1), (i+1, j-1),
-            (i, j-1), (i-1, j+1),
-        )
-        return [(ni, nj) for ni, nj in possible_neighbors if Coords.is_valid(ni, nj, w, h)]
+@njit(cache=True)
+def _heappop(heap, n):
+    """
+    Remove the entry with minimum (f, counter) from a binary min-heap.
+    
+    Args:
+        heap: (capacity, 3) array of (f, counter, idx) rows.
+        n: Number of entries in the heap, must be positive.
         
+    Returns:
+        Flat index of the removed entry's cell and new number of entries in the heap.
+    """
+    idx = int(heap[0, 2])
+    n -= 1
+    _heap_swap(heap, 0, n)
+    pos = 0
+    while True:
+        child = 2*pos + 1
+        if child >= n:
+            break
+        if child + 1 < n and _heap_less(heap, child + 1, child):
+            child += 1
+        if not _heap_less(heap, child, pos):
+            break
+        _heap_swap(heap, pos, child)
+        pos = child
+    return idx, n
+
 
-class Cell:
-    """Single unit in the Maze."""
+@njit(cache=True)
+def _a_star(v, width, height, start_i, start_j, goal_i, goal_j, g_arr, parent, closed, h_cache, open_list):
+    """
+    Use A* to find a path from start to goal cell, compiled to native code.
     
-    def __init__(self, f, g, h, i, j, v, parent_cell, is_open=False):
-        """
-        Create a new Cell instance. 
+    Every array is a flat view of a (height, width) grid, indexed by 'i*width + j'.
+    
+    Args:
+        v: Values that the cells hold, as bytes.
+        width, height: Width and height of the maze.
+        start_i, start_j: Coordinates of start cell.
+        goal_i, goal_j: Coordinates of goal cell.
+        g_arr: Distance from start to cells. All inf initially.
+        parent: Parent cell indexes, filled by the search. All -1 initially.
+        closed: Is the cell evaluated already? All 0 initially.
+        h_cache: Heuristic distance to goal of cells, '-1' if not calculated yet.
+        open_list: Buffer for the heap of (f, counter, idx) entries, see '_heappush'.
         
-        Args:
-            i, j: Coordinates of Cell.
-            v: Value that the Cell holds.
-            h: Holds the heuristic distance from Cell to goal.
-            g: Holds the distance from start to Cell.
-            f: g + h.
-            parent_cell: Cell that comes beBack in the path.    
-            is_open: Is the Cell open for evaluation?
-            is_open: Is the Cell visited?
-        """
-        self.f, self.g, self.h = f, g, h
-        self.i, self.j = i, j
-        self.v = v
-        self.parent = parent_cell
-        self.is_open = is_open
+    Returns:
+        True if goal is reached, then 'parent' holds the path. Otherwise False. Also the heap
+        buffer, which is a bigger one if it had to grow.
+    """
+    
+    # open_list: Heap of (f, counter, idx) entries of cells that are not evaluated yet.
+    # A cell might be pushed more than once, older (stale) entries are skipped when popped.
+    n = 0
+    counter = 0
+    
+    # Shortest f (which is g, as its h is 0) found for goal cell so far. Entries with f that is
+    # not shorter can't be on a better path to goal, so they are never pushed.
+    goal = goal_i*width + goal_j
+    best_goal_f = np.inf
+    
+    # Add starting cell to open_list with g = 0 (as its distance to start is 0)
+    start = start_i*width + start_j
+    g_arr[start] = 0
+    open_list, n = _heappush(open_list, n, 0.0, counter, start)
+    
+    # While open_list is not empty, so not all possible cells are evaluated.
+    while n > 0:
+        
+        # Find the cell with minimum f (total distance to goal) and remove it from open_list.
+        # It will be called the 'current' cell. Skip it, if it is already evaluated.
+        current, n = _heappop(open_list, n)
+        if closed[current]:
+            continue
         
-    def __repr__(self):
-        if self.parent is None:
-            return f"{self.i},{self.j} - NoParent"
-        return f"{self.i},{self.j} - {self.parent.i},{self.parent.j}"
+        # Is current cell goal? Then finish the search, path can be generated from parents.
+        # With a consistent heuristic, its g can't get shorter after it is popped.
+        if current == goal:
+            return True, open_list
+        ci, cj = current // width, current % width
+        
+        # Look at current cell's valid neighbors. Neighbors of interior cells are always
+        # inside the maze, only cells on the border need the bounds check.
+        is_interior = 0 < ci < height-1 and 0 < cj < width-1
+        for di, dj, step in NEIGHBOR_STEPS:
+            ni, nj = ci + di, cj + dj
+            if not is_interior and not (0 <= ni < height and 0 <= nj < width):
+                continue
+            neighbor = ni*width + nj
+            
+            # Skip neighbors that are already evaluated. Euclidean distance is a consistent
+            # heuristic on this grid, so a cell's g is the shortest when it is first popped and
+            # relaxing it again can't find a shorter path.
+            if closed[neighbor]:
+                continue
+            
+            # If neighbor is wall, skip it.
+            elif v[neighbor] == WALL:
+                continue
+            
+            # Generate f, g, h values of the neighbor cell, based on the current path.
+            # h is heuristic distance to goal, while g is distance of path from start.
+            # f is sum of both, so f = g + h. 
+            # In this case, checking if new g value is shorter or not.
+            else:
+                g = g_arr[current] + step
+                h = h_cache[neighbor]
+                if h < 0:
+                    h = math.hypot(ni - goal_i, nj - goal_j)
+                    h_cache[neighbor] = h
+                f = g + h
+                if f >= best_goal_f:
+                    continue
+                
+                # First time the neighbor cell is visited or found a shorter path to it.
+                # Instead of updating its entry in open_list, push it again with the new f.
+                if g < g_arr[neighbor]:
+                    g_arr[neighbor] = g
+                    parent[neighbor] = current
+                    counter += 1
+                    open_list, n = _heappush(open_list, n, f, counter, neighbor)
+                    if neighbor == goal:
+                        best_goal_f = f
+                    
+        closed[current] = 1
     
-    def __lt__(self, cell):
-        return self.f < cell.f
+    # open_list got empty but goal haven't found.
+    return False, open_list
 
 
+@njit(cache=True)
+def _path_indexes(parent, goal):
+    """
+    Use parents of cells to generate the path from goal back to start.
+    
+    Args:
+        parent: Flat array of parent cell indexes, as filled by '_a_star'.
+        goal: Flat index of goal cell.
+        
+    Returns:
+        Flat cell indexes of the path from start to goal.
+    """
+    
+    # Write the path backwards into a buffer that can hold every cell of the maze.
+    # Starting cell's parent is -1, stop if this is the case.
+    path_idx = np.empty(parent.size, np.int32)
+    k = 0
+    p = goal
+    while p != -1:
+        path_idx[k] = p
+        k += 1
+        p = parent[p]
+    return path_idx[:k][::-1]
+        
+
 class Maze:
     """Maze that will be loaded from a file."""
     
@@ -97,112 +238,80 @@ class Maze:
             path: Path to maze file.
         """
         
-        # Read the maze file and save characters in a grid (2D-list) called 'maze_raw'. 
-        maze_raw = []
-        with open(path) as fp:
-            for i, row in enumerate(fp.readlines()):
-                maze_raw.append(list())
-                for j, c in enumerate(row):
-                    
-                    # Save start and goal cells locations, while reading the file.
-                    if c == 'S':
-                        self.start_i, self.start_j = i, j
-                    elif c == 'G':
-                        self.goal_i, self.goal_j = i, j
-                    if c != '\n':
-                        maze_raw[i].append(c)
-        
-        # Save maze width and height.
-        self.w, self.h = j, i+1
-        
-        # List of permutation of indexes from i=(0-h) and j=(0-w).
-        self.indexes = ((i, j) for i in range(self.h) for j in range(self.w))
-        
-        # While using 'maze_raw', create 'self.maze', a dict representation of maze with Cells. 
-        self.maze = {}
-        for i, j in self.indexes:
-            # '-1' represents infinity. 'maze_raw[i][j]' is value of Cell. Currently, Cells have no parents.
-            self.maze[(i, j)] = Cell(-1, -1, -1, i, j, maze_raw[i][j], None)
+        # Read the maze file at once and split it into rows. Trailing empty lines are not rows.
+        with open(path, 'rb') as fp:
+            rows = fp.read().rstrip(b'\r\n').splitlines()
+        
+        # Save maze width and height. Short rows are padded with walls, so that the maze is
+        # rectangular and the search can't go through cells that the file didn't define.
+        self.w, self.h = max(len(row) for row in rows), len(rows)
+        rows = [row.ljust(self.w, b'X') for row in rows]
+        
+        # Save characters in a (h, w) grid of single bytes, then find start and goal cells in it.
+        # If there are more than one start or goal cells, the last ones are used.
+        maze_raw = np.frombuffer(b''.join(rows), dtype='S1').reshape(self.h, self.w)
+        self.start_i, self.start_j = (int(x[-1]) for x in np.where(maze_raw == b'S'))
+        self.goal_i, self.goal_j = (int(x[-1]) for x in np.where(maze_raw == b'G'))
+        
+        # Structure-of-Arrays representation of the maze, every array has shape (h, w).
+        # v: Value that the cell holds.
+        # g: Distance from start to cell. f values are only kept in the heap entries.
+        # parent: Cell that comes before in the path, encoded as 'pi*w + pj'. '-1' means no parent.
+        self.v = maze_raw.copy()
+        self.g = np.full((self.h, self.w), np.inf, 'f8')
+        self.parent = np.full((self.h, self.w), -1, 'i4')
+        
+        # Flag of each cell, packed in one byte per cell and indexed by 'i*w + j'.
+        # closed: Is the cell evaluated (expanded) already? A cell is open while it has finite g.
+        self.closed = np.zeros(self.h*self.w, 'u1')
+        
+        # Heuristic distance from cell to goal. It is lazily calculated the first time a cell is
+        # reached and does not change between searches. '-1' means not calculated yet.
+        self.h_cache = np.full((self.h, self.w), -1.0, 'f8')
+        
+        # Buffer for the heap of the search, with room for one entry per cell. It is reused
+        # between searches and doubled by the search when it gets full.
+        self.open_list = np.empty((self.h*self.w, 3), np.float64)
         
         # Find route from start to goal. Calculate number of coins.
         self.path = self.a_star_pathfind()
-        self.collected_coins = sum(int(cell.v) for cell in self.path if cell.v.isnumeric())
+        self.collected_coins = int(COIN_VALUES[self.v.view('u1')[self.path[:, 0], self.path[:, 1]]].sum())
+        
+        # Mark cells on the path in a (h, w) boolean mask, for constant time membership checks.
+        self.path_mask = np.zeros((self.h, self.w), bool)
+        self.path_mask[self.path[:, 0], self.path[:, 1]] = True
         
     
     def a_star_pathfind(self):
         """
-        Use A* to find a path from start to goal Cell.
+        Use A* to find a path from start to goal cell.
         
         Returns:
-            A list of Cells that forms the path from start to goal. If there
-            is no possible path, an empty list.
+            An (n, 2) array of (i,j) coordinates that forms the path from start to goal. If there
+            is no possible path, an empty array.
         """
         
-        # open_list: List of Cells that are not visited (evaluated) yet.
-        open_list = []
+        # Reset the search state, so the maze can be solved more than once.
+        self.g.fill(np.inf)
+        self.parent.fill(-1)
+        self.closed.fill(0)
         
-        # Add starting Cell to open_list with g = 0 (as its distance to start is 0)
-        start_cell = self.maze[(self.start_i, self.start_j)]
-        start_cell.g = 0
-        heapq.heappush(open_list, start_cell)
+        # Run the compiled search on flat views of the arrays, it fills 'self.parent' in place.
+        # Keep the heap buffer for the next search, in case it had to grow.
+        reached, self.open_list = _a_star(
+            self.v.view('u1').ravel(), self.w, self.h,
+            self.start_i, self.start_j, self.goal_i, self.goal_j,
+            self.g.ravel(), self.parent.ravel(), self.closed, self.h_cache.ravel(),
+            self.open_list,
+        )
         
-        # While open_list is not empty, so not all possible Cells are evaluated.
-        while open_list:
-            
-            # Find the Cell with minimum f (total distance to goal) and remove it from open_list.
-            # It will be called the 'current' Cell.
-            current = heapq.heappop(open_list)
-            
-            # Look at current Cell's valid neighbors.
-            for ni, nj in Coords.neighbors(current.i, current.j, self.w, self.h):
-                neighbor_cell = self.maze[(ni, nj)]
-                
-                # Is neighbor goal? Then finish the search and return the path.
-                if ni == self.goal_i and nj == self.goal_j:
-                    
-                    # Use parent's of Cells' to generate the path from goal back to start.
-                    cell = neighbor_cell
-                    cell.parent = current
-                    path = []
-                    
-                    # Starting Cell's parent is None, stop if this is the case.
-                    while cell is not None:
-                        path.append(cell)
-                        cell = cell.parent
-                    return list(reversed(path))
-                
-                # If neighbor is wall, skip it.
-                elif self.maze[(ni, nj)].v == 'X':
-                    continue
-                
-                # Generate f, g, h values of the neighbor Cell, based on the current path.
-                # There might be more than one way to reach a Cell, some are farther away from
-                # the goal.
-                # h is heuristic distance to goal, while g is distance of path from start.
-                # f is sum of both, so f = g + h. 
-                # In this case, checking if new f value is shorter or not.
-                else:
-                    g = current.g + Coords.distance(ni, nj, current.i, current.j)
-                    h = Coords.distance(ni, nj, self.goal_i, self.goal_j)
-                    f = g + h
-                    
-                    # First time the neighbor Cell is visited.
-                    if not neighbor_cell.is_open:
-                        neighbor_cell.f, neighbor_cell.g, neighbor_cell.h = f, g, h
-                        neighbor_cell.parent = current
-                        neighbor_cell.is_open = True
-                        heapq.heappush(open_list, neighbor_cell)
-                    
-                    # Found a shorter path to the neighbor Cell.
-                    # As Cells start with f=-1, this condition will not met until they get open.
-                    elif f < neighbor_cell.f: 
-                        neighbor_cell.f = f
-                        neighbor_cell.parent = current
-                        
-            current.is_open = True
+        # open_list got empty but goal haven't found. Return an empty array as path.
+        if not reached:
+            return np.empty((0, 2), 'i4')
         
-        # open_list got empty but goal haven't found. Return an empty list as path.
-        return []
+        # Convert flat cell indexes of the path to (i,j) coordinates.
+        path_idx = _path_indexes(self.parent.ravel(), self.goal_i*self.w + self.goal_j)
+        return np.stack(np.divmod(path_idx, self.w), axis=1)
     
     
     def time_a_star(self, n=100):
@@ -213,11 +322,15 @@ class Maze:
             n: Number of times to run A* algorithm to get a better average value.
         """
         
+        # Bind the timer and the search locally, so attribute lookups are not timed.
+        perf_counter_ns = time.perf_counter_ns
+        a_star_pathfind = self.a_star_pathfind
+        
         time_sum = 0
         for i in range(n):
-            start = time.perf_counter_ns()
-            self.a_star_pathfind()
-            stop = time.perf_counter_ns()
+            start = perf_counter_ns()
+            a_star_pathfind()
+            stop = perf_counter_ns()
             time_sum += stop-start
 
         print("Times: {}, Total: {}ms, Avg: {}ms".format(n, round(time_sum/1000, 4), round((time_sum/1000)/n, 4)))
@@ -225,23 +338,17 @@ class Maze:
     
     def print(self):
         """Prints the maze and the path, colored and formatted."""
-        s = ""
+        
+        # Colored tile of each special cell value. Other cells are either on the path or empty.
+        palette = {c: color + "  " + Back.RESET for c, color in ((b'X', Back.RED), (b'S', Back.YELLOW), (b'G', Back.GREEN))}
+        path_tile = Back.BLUE + "  " + Back.RESET
+        empty_tile = Back.WHITE + "  " + Back.RESET
+        
+        rows = []
         for i in range(self.h):
-            s += "\n"
-            for j in range(self.w):
-                c = self.maze[(i, j)].v
-                
-                if c == 'X':
-                    s += Back.RED + "  " + Back.RESET
-                elif c == 'S':
-                    s += Back.YELLOW + "  " + Back.RESET
-                elif c == 'G':
-                    s += Back.GREEN + "  " + Back.RESET
-                elif self.maze[(i, j)] in self.path:
-                    s += Back.BLUE + "  " + Back.RESET
-                else:
-                    s += Back.WHITE + "  " + Back.RESET
-        print(s)
+            v, mask = self.v[i], self.path_mask[i]
+            rows.append("".join(palette.get(v[j], path_tile if mask[j] else empty_tile) for j in range(self.w)))
+        print("\n" + "\n".join(rows))
         print(f"Collected {self.collected_coins} coins.")
             
     